@@ -1007,14 +1007,14 @@ def pipeline(  # noqa: C901
     logging.debug(f"evaluator_kwargs: {evaluator_kwargs}")
 
     # Train like Cristiano Ronaldo
-    training_start_time = time.time()
+    training_start_time = time.perf_counter()
     losses = training_loop_instance.train(
         stopper=stopper,
         result_tracker=result_tracker,
         clear_optimizer=clear_optimizer,
         **training_kwargs,
     )
-    training_end_time = time.time() - training_start_time
+    training_end_time = time.perf_counter() - training_start_time
 
     if use_testing_data:
         mapped_triples = testing.mapped_triples
@@ -1029,13 +1029,13 @@ def pipeline(  # noqa: C901
     # Add logging about evaluator for debugging
     logging.debug("Evaluation will be run with following parameters:")
     logging.debug(f"evaluation_kwargs: {evaluation_kwargs}")
-    evaluate_start_time = time.time()
+    evaluate_start_time = time.perf_counter()
     metric_results: MetricResults = evaluator_instance.evaluate(
         model=model_instance,
         mapped_triples=mapped_triples,
         **evaluation_kwargs,
     )
-    evaluate_end_time = time.time() - evaluate_start_time
+    evaluate_end_time = time.perf_counter() - evaluate_start_time
     result_tracker.log_metrics(
         metrics=metric_results.to_dict(),
         step=training_kwargs.get('num_epochs'),
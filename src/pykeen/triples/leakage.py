@@ -197,13 +197,17 @@ def unleak(
 
 def reindex(*triples_factories: TriplesFactory) -> List[TriplesFactory]:
     """Reindex a set of triples factories."""
-    triples = np.concatenate(
-        [
-            triples_factory.triples
-            for triples_factory in triples_factories
-        ],
-        axis=0,
+    # Fill a single pre-allocated buffer instead of concatenating, so no intermediate list of arrays is needed
+    num_triples = sum(triples_factory.triples.shape[0] for triples_factory in triples_factories)
+    triples = np.empty(
+        (num_triples, 3),
+        dtype=np.result_type(*(triples_factory.triples for triples_factory in triples_factories)),
     )
+    start = 0
+    for triples_factory in triples_factories:
+        stop = start + triples_factory.triples.shape[0]
+        triples[start:stop] = triples_factory.triples
+        start = stop
     entity_to_id = create_entity_mapping(triples)
     relation_to_id = create_relation_mapping(set(triples[:, 1]))
 
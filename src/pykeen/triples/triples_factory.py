@@ -6,18 +6,17 @@ import dataclasses
 import logging
 import os
 import re
-from collections import Counter, defaultdict
+from collections import Counter
 from typing import Collection, Dict, Iterable, List, Mapping, Optional, Sequence, Set, TextIO, Tuple, Union
 
 import numpy as np
 import pandas as pd
 import torch
-from tqdm.autonotebook import tqdm
 
 from .instances import LCWAInstances, SLCWAInstances
 from .utils import load_triples
 from ..typing import EntityMapping, LabeledTriples, MappedTriples, RandomHint, RelationMapping
-from ..utils import compact_mapping, ensure_random_state, invert_mapping, slice_triples
+from ..utils import compact_mapping, ensure_random_state, invert_mapping
 
 __all__ = [
     'TriplesFactory',
@@ -39,7 +38,6 @@ def get_unique_entity_ids_from_triples_tensor(mapped_triples: MappedTriples) ->
 
 def _create_multi_label_tails_instance(
     mapped_triples: MappedTriples,
-    use_tqdm: Optional[bool] = None,
 ) -> Dict[Tuple[int, int], List[int]]:
     """Create for each (h,r) pair the multi tail label."""
     logger.debug('Creating multi label tails instance')
@@ -55,7 +53,6 @@ def _create_multi_label_tails_instance(
         element_1_index=0,
         element_2_index=1,
         label_index=2,
-        use_tqdm=use_tqdm,
     )
 
     logger.debug('Created multi label tails instance')
@@ -68,28 +65,32 @@ def _create_multi_label_instances(
     element_1_index: int,
     element_2_index: int,
     label_index: int,
-    use_tqdm: Optional[bool] = None,
 ) -> Dict[Tuple[int, int], List[int]]:
     """Create for each (element_1, element_2) pair the multi-label."""
-    instance_to_multi_label = defaultdict(set)
-
-    if use_tqdm is None:
-        use_tqdm = True
-
-    it = mapped_triples
-    if use_tqdm:
-        it = tqdm(mapped_triples, unit='triple', unit_scale=True, desc='Grouping triples')
-    for row in it:
-        instance_to_multi_label[row[element_1_index], row[element_2_index]].add(row[label_index])
-
-    # Create lists out of sets for proper numpy indexing when loading the labels
-    # TODO is there a need to have a canonical sort order here?
-    instance_to_multi_label_new = {
-        key: list(value)
-        for key, value in instance_to_multi_label.items()
-    }
-
-    return instance_to_multi_label_new
+    # Sort by (element_1, element_2, label), such that each group is a contiguous block of sorted labels
+    order = np.lexsort((
+        mapped_triples[:, label_index],
+        mapped_triples[:, element_2_index],
+        mapped_triples[:, element_1_index],
+    ))
+    keys = mapped_triples[order][:, [element_1_index, element_2_index]]
+    labels = mapped_triples[order, label_index]
+
+    # Mark the first row of each group
+    is_group_start = np.ones(keys.shape[0], dtype=bool)
+    is_group_start[1:] = (keys[1:] != keys[:-1]).any(axis=1)
+
+    # Drop duplicate labels within a group
+    keep = is_group_start.copy()
+    keep[1:] |= labels[1:] != labels[:-1]
+    keys, labels, is_group_start = keys[keep], labels[keep], is_group_start[keep]
+
+    # Create lists out of the label blocks for proper numpy indexing when loading the labels
+    starts = np.flatnonzero(is_group_start)
+    return dict(zip(
+        map(tuple, keys[starts].tolist()),
+        (group.tolist() for group in np.split(labels, starts[1:])),
+    ))
 
 
 def create_entity_mapping(triples: LabeledTriples) -> EntityMapping:
@@ -100,7 +101,7 @@ def create_entity_mapping(triples: LabeledTriples) -> EntityMapping:
     # Split triples
     heads, tails = triples[:, 0], triples[:, 2]
     # Sorting ensures consistent results when the triples are permuted
-    entity_labels = sorted(set(heads).union(tails))
+    entity_labels = np.sort(pd.unique(np.concatenate([heads, tails])))
     # Create mapping
     return {
         str(label): i
@@ -108,16 +109,20 @@ def create_entity_mapping(triples: LabeledTriples) -> EntityMapping:
     }
 
 
+def _get_relation_sort_key(relation: str) -> Tuple[str, bool]:
+    """Get a sort key which places each inverse relation directly after its forward relation."""
+    if relation.endswith(INVERSE_SUFFIX):
+        return relation[:-len(INVERSE_SUFFIX)], True
+    return relation, False
+
+
 def create_relation_mapping(relations: set) -> RelationMapping:
     """Create mapping from relation labels to IDs.
 
     :param relations: set
     """
     # Sorting ensures consistent results when the triples are permuted
-    relation_labels = sorted(
-        set(relations),
-        key=lambda x: (re.sub(f'{INVERSE_SUFFIX}$', '', x), x.endswith(f'{INVERSE_SUFFIX}')),
-    )
+    relation_labels = sorted(set(relations), key=_get_relation_sort_key)
     # Create mapping
     return {
         str(label): i
@@ -125,6 +130,11 @@ def create_relation_mapping(relations: set) -> RelationMapping:
     }
 
 
+def _map_labels_to_ids(labels: np.ndarray, label_to_id: Mapping[str, int]) -> np.ndarray:
+    """Map an array of labels to their IDs with a single hash-based lookup, using -1 for unknown labels."""
+    return pd.Series(labels).map(label_to_id).fillna(-1).to_numpy(dtype=np.int64)
+
+
 def _map_triples_elements_to_ids(
     triples: LabeledTriples,
     entity_to_id: EntityMapping,
@@ -135,14 +145,10 @@ def _map_triples_elements_to_ids(
         logger.warning('Provided empty triples to map.')
         return torch.empty(0, 3, dtype=torch.long)
 
-    heads, relations, tails = slice_triples(triples)
-
     # When triples that don't exist are trying to be mapped, they get the id "-1"
-    entity_getter = np.vectorize(entity_to_id.get)
-    head_column = entity_getter(heads, [-1])
-    tail_column = entity_getter(tails, [-1])
-    relation_getter = np.vectorize(relation_to_id.get)
-    relation_column = relation_getter(relations, [-1])
+    head_column = _map_labels_to_ids(triples[:, 0], entity_to_id)
+    relation_column = _map_labels_to_ids(triples[:, 1], relation_to_id)
+    tail_column = _map_labels_to_ids(triples[:, 2], entity_to_id)
 
     # Filter all non-existent triples
     head_filter = head_column < 0
@@ -158,20 +164,49 @@ def _map_triples_elements_to_ids(
             f" that are not in the training set. These triples will be excluded from the mapping.",
         )
         non_mappable_triples = (head_filter | relation_filter | tail_filter)
-        head_column = head_column[~non_mappable_triples, None]
-        relation_column = relation_column[~non_mappable_triples, None]
-        tail_column = tail_column[~non_mappable_triples, None]
+        head_column = head_column[~non_mappable_triples]
+        relation_column = relation_column[~non_mappable_triples]
+        tail_column = tail_column[~non_mappable_triples]
         logger.warning(
             f"In total {non_mappable_triples.sum():.0f} from {triples.shape[0]:.0f} triples were filtered out",
         )
 
-    triples_of_ids = np.concatenate([head_column, relation_column, tail_column], axis=1)
+    # Fill the columns into a single pre-allocated array
+    triples_of_ids = np.empty((head_column.shape[0], 3), dtype=np.int64)
+    triples_of_ids[:, 0] = head_column
+    triples_of_ids[:, 1] = relation_column
+    triples_of_ids[:, 2] = tail_column
 
-    triples_of_ids = np.array(triples_of_ids, dtype=np.long)
     # Note: Unique changes the order of the triples
     # Note: Using unique means implicit balancing of training samples
-    unique_mapped_triples = np.unique(ar=triples_of_ids, axis=0)
-    return torch.tensor(unique_mapped_triples, dtype=torch.long)
+    unique_mapped_triples = _unique_triples(triples_of_ids)
+    # The unique triples are a freshly allocated int64 array, so they can be shared with torch without a copy
+    return torch.from_numpy(unique_mapped_triples)
+
+
+def _unique_triples(triples: np.ndarray) -> np.ndarray:
+    """Get the unique ID-based triples in lexicographical order.
+
+    If the IDs are small enough, each triple is packed into a single 64-bit integer, so that a one-dimensional unique
+    can be used instead of the much slower row-wise ``np.unique(axis=0)``.
+    """
+    if triples.shape[0] == 0:
+        return triples
+
+    entity_bits = int(max(triples[:, 0].max(), triples[:, 2].max())).bit_length()
+    relation_bits = int(triples[:, 1].max()).bit_length()
+    if 2 * entity_bits + relation_bits > 63:
+        return np.unique(triples, axis=0)
+
+    # The head occupies the most significant bits, so sorting the packed triples sorts them lexicographically
+    packed = (triples[:, 0] << (relation_bits + entity_bits)) | (triples[:, 1] << entity_bits) | triples[:, 2]
+    packed = np.unique(packed)
+
+    rv = np.empty((packed.shape[0], 3), dtype=triples.dtype)
+    rv[:, 0] = packed >> (relation_bits + entity_bits)
+    rv[:, 1] = (packed >> entity_bits) & ((1 << relation_bits) - 1)
+    rv[:, 2] = packed & ((1 << entity_bits) - 1)
+    return rv
 
 
 @dataclasses.dataclass
@@ -246,16 +281,20 @@ class TriplesFactory:
                     relation: f"{relation}{INVERSE_SUFFIX}"
                     for relation in unique_relations
                 }
-                inverse_triples = np.stack(
-                    [
-                        triples[:, 2],
-                        np.array([relation_to_inverse[relation] for relation in relations], dtype=np.str),
-                        triples[:, 0],
-                    ],
-                    axis=-1,
-                )
-                # extend original triples with inverse ones
-                triples = np.concatenate([triples, inverse_triples], axis=0)
+                # look up the inverse labels once per relation instead of once per triple
+                relation_labels, relation_index = np.unique(relations, return_inverse=True)
+                inverse_relations = np.array(
+                    [relation_to_inverse[relation] for relation in relation_labels],
+                    dtype=np.str,
+                )[relation_index]
+                # extend original triples with inverse ones, filling a single pre-allocated array
+                num_triples = triples.shape[0]
+                all_triples = np.empty((2 * num_triples, 3), dtype=np.result_type(triples, inverse_relations))
+                all_triples[:num_triples] = triples
+                all_triples[num_triples:, 0] = triples[:, 2]
+                all_triples[num_triples:, 1] = inverse_relations
+                all_triples[num_triples:, 2] = triples[:, 0]
+                triples = all_triples
 
         else:
             create_inverse_triples = False
@@ -373,6 +412,40 @@ class TriplesFactory:
         """The mapping from relation IDs to their labels."""
         return invert_mapping(mapping=self.relation_to_id)
 
+    def label_triples(
+        self,
+        triples: Union[MappedTriples, np.ndarray],
+        unknown_entity_label: str = '[UNKNOWN]',
+        unknown_relation_label: Optional[str] = None,
+    ) -> LabeledTriples:
+        """Convert ID-based triples to label-based ones.
+
+        :param triples: shape: (n, 3)
+            The ID-based triples.
+        :param unknown_entity_label:
+            The label to use for unknown entity IDs.
+        :param unknown_relation_label:
+            The label to use for unknown relation IDs. Defaults to the unknown entity label.
+
+        :return: shape: (n, 3)
+            The label-based triples.
+        """
+        if unknown_relation_label is None:
+            unknown_relation_label = unknown_entity_label
+        if torch.is_tensor(triples):
+            triples = triples.cpu().numpy()
+
+        # fill each column with a single hash-based lookup into one pre-allocated array
+        entity_id_to_label = self.entity_id_to_label
+        labeled_triples = np.empty(triples.shape, dtype=object)
+        for column, id_to_label, unknown_label in (
+            (0, entity_id_to_label, unknown_entity_label),
+            (1, self.relation_id_to_label, unknown_relation_label),
+            (2, entity_id_to_label, unknown_entity_label),
+        ):
+            labeled_triples[:, column] = pd.Series(triples[:, column]).map(id_to_label).fillna(unknown_label)
+        return labeled_triples
+
     def get_inverse_relation_id(self, relation: str) -> int:
         """Get the inverse relation identifier for the given relation."""
         if not self.create_inverse_triples:
@@ -410,11 +483,11 @@ class TriplesFactory:
         )
 
     def create_lcwa_instances(self, use_tqdm: Optional[bool] = None) -> LCWAInstances:
-        """Create LCWA instances for this factory's triples."""
-        s_p_to_multi_tails = _create_multi_label_tails_instance(
-            mapped_triples=self.mapped_triples,
-            use_tqdm=use_tqdm,
-        )
+        """Create LCWA instances for this factory's triples.
+
+        :param use_tqdm: Unused, since grouping the triples is vectorized. Kept for compatibility.
+        """
+        s_p_to_multi_tails = _create_multi_label_tails_instance(mapped_triples=self.mapped_triples)
         sp, multi_o = zip(*s_p_to_multi_tails.items())
         mapped_triples: torch.LongTensor = torch.tensor(sp, dtype=torch.long)
         labels = np.array([np.array(item) for item in multi_o], dtype=object)
@@ -471,7 +544,7 @@ class TriplesFactory:
             ratios = [0.8, 0.1, 0.1]  # also makes a [0.8, 0.1, 0.1] split
             training_factory, testing_factory, validation_factory = factory.split(ratios)
         """
-        n_triples = self.triples.shape[0]
+        n_triples = self.num_triples
 
         # Prepare shuffle index
         idx = np.arange(n_triples)
@@ -484,7 +557,7 @@ class TriplesFactory:
 
         ratio_sum = sum(ratios)
         if ratio_sum == 1.0:
-            ratios = ratios[:-1]  # vsplit doesn't take the final number into account.
+            ratios = ratios[:-1]  # the final group gets the remaining triples.
         elif ratio_sum > 1.0:
             raise ValueError(f'ratios sum to more than 1.0: {ratios} (sum={ratio_sum})')
 
@@ -495,8 +568,12 @@ class TriplesFactory:
         # Take cumulative sum so the get separated properly
         split_idxs = np.cumsum(sizes)
 
-        # Split triples
-        triples_groups = np.vsplit(self.triples[idx], split_idxs)
+        # Split the ID-based triples into slices of a single shuffled copy
+        shuffled_triples = self.mapped_triples.cpu().numpy()[idx]
+        triples_groups = [
+            shuffled_triples[start:stop]
+            for start, stop in zip([0, *split_idxs], [*split_idxs, n_triples])
+        ]
         logger.info(
             'done splitting triples to groups of sizes %s',
             [triples.shape[0] for triples in triples_groups],
@@ -516,13 +593,14 @@ class TriplesFactory:
                     f'(equal to size {actual_size}) to ensure that all entities/relations occur in train.',
                 )
 
-        # Make new triples factories for each group
+        # Make new triples factories for each group, which are already mapped with the same IDs
         return [
-            TriplesFactory.from_labeled_triples(
-                triples=triples,
+            TriplesFactory(
                 entity_to_id=self.entity_to_id,
                 relation_to_id=self.relation_to_id,
-                compact_id=False,
+                _triples=self.label_triples(triples),
+                mapped_triples=torch.from_numpy(triples),
+                relation_to_inverse=self.relation_to_inverse,
             )
             for triples in triples_groups
         ]
@@ -11,6 +11,7 @@ from pykeen.datasets import Nations
 from pykeen.triples import TriplesFactory, TriplesNumericLiteralsFactory
 from pykeen.triples.triples_factory import (
     INVERSE_SUFFIX, TRIPLES_DF_COLUMNS, _tf_cleanup_all, _tf_cleanup_deterministic, _tf_cleanup_randomized,
+    _unique_triples,
 )
 
 triples = np.array(
@@ -134,6 +135,17 @@ class TestTriplesFactory(unittest.TestCase):
             for k in id_to_label.keys():
                 assert label_to_id[id_to_label[k]] == k
 
+    def test_unique_triples(self):
+        """Test that packed deduplication matches the row-wise unique, also for IDs which do not fit packing."""
+        random_state = np.random.RandomState(seed=42)
+        for max_id in (1, 100, 2 ** 40):
+            mapped_triples = random_state.randint(max_id, size=(100, 3), dtype=np.int64)
+            mapped_triples = np.concatenate([mapped_triples, mapped_triples[:10]])
+            self.assertEqual(
+                np.unique(mapped_triples, axis=0).tolist(),
+                _unique_triples(mapped_triples).tolist(),
+            )
+
     def test_tensor_to_df(self):
         """Test tensor_to_df()."""
         # check correct translation
@@ -237,6 +249,13 @@ class TestSplit(unittest.TestCase):
             id(self.triples_factory.relation_to_id),
         })
 
+        # verify that the labeled triples match the ID-based ones
+        for factory in all_factories:
+            self.assertEqual(
+                set(map(tuple, factory.mapped_triples.tolist())),
+                set(map(tuple, factory.map_triples_to_id(factory.triples).tolist())),
+            )
+
     def test_split_naive(self):
         """Test splitting a factory in two with a given ratio."""
         ratio = 0.8